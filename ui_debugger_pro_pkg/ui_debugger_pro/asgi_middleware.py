@@ -3,6 +3,7 @@ ASGI Middleware for FastAPI and other ASGI apps.
 """
 import json
 import os
+from urllib.parse import parse_qs
 from .config import is_enabled
 
 
@@ -17,6 +18,11 @@ class ASGIDebuggerMiddleware:
             await self.app(scope, receive, send)
             return
         
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        if query.get('ui_debugger_ignore') == ['true']:
+            await self.app(scope, receive, send)
+            return
+        
         # Buffer the response
         response_started = False
         status_code = None
@@ -0,0 +1,223 @@
+"""
+A/B overhead benchmark for a running app.
+
+Requests alternate between injection on and off (`ui_debugger_ignore=true`)
+on the same keep-alive connections, so both sides see the same server state
+and any drift during the run affects them equally.
+"""
+import asyncio
+import ssl
+import time
+from urllib.parse import urlsplit
+
+IGNORE_PARAM = 'ui_debugger_ignore=true'
+
+
+class BenchError(Exception):
+    pass
+
+
+# Everything a single request can fail with once the connection is open.
+REQUEST_ERRORS = (OSError, EOFError, asyncio.LimitOverrunError, BenchError)
+
+
+def with_ignore(path):
+    """Return `path` with the debugger ignore flag added to its query string."""
+    return path + ('&' if '?' in path else '?') + IGNORE_PARAM
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def read_rss(pid):
+    """Resident set size of `pid` in bytes, or None if it can't be read."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss
+    except Exception:
+        return None
+
+
+class Connection:
+    """A single keep-alive HTTP/1.1 connection."""
+
+    def __init__(self, host, port, use_ssl):
+        self.host = host
+        self.port = port
+        self.ssl = ssl.create_default_context() if use_ssl else None
+        self.reader = None
+        self.writer = None
+
+    async def _open(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+
+    async def get(self, path):
+        """Send a GET and return (status, body_length)."""
+        if self.writer is None:
+            await self._open()
+        host_header = self.host if self.port in (80, 443) else f'{self.host}:{self.port}'
+        self.writer.write(
+            f'GET {path} HTTP/1.1\r\nHost: {host_header}\r\n'
+            f'Accept: text/html,*/*\r\nConnection: keep-alive\r\n\r\n'.encode('latin-1')
+        )
+        await self.writer.drain()
+
+        head = await self.reader.readuntil(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        status_line = lines[0].split()
+        if len(status_line) < 2 or not status_line[0].startswith('HTTP/') or not status_line[1].isdigit():
+            self.close()
+            raise BenchError(f"Not an HTTP response: {lines[0][:60]!r}")
+        status = int(status_line[1])
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            if name:
+                headers[name.strip().lower()] = value.strip()
+
+        try:
+            body_length = await self._read_body(headers)
+        except ValueError:
+            self.close()
+            raise BenchError("Malformed Content-Length or chunk size in response")
+        if body_length is None:
+            body_length = len(await self.reader.read())
+            headers['connection'] = 'close'
+
+        connection = headers.get('connection', '').lower()
+        if connection == 'close' or (lines[0].startswith('HTTP/1.0') and connection != 'keep-alive'):
+            self.close()
+        return status, body_length
+
+    async def _read_body(self, headers):
+        """Read the body and return its length, or None if it runs to EOF."""
+        if 'content-length' in headers:
+            body_length = int(headers['content-length'])
+            await self.reader.readexactly(body_length)
+            return body_length
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            body_length = 0
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                await self.reader.readexactly(size + 2)  # chunk + CRLF
+                body_length += size
+                if size == 0:
+                    return body_length
+        return None
+
+
+async def _run(url, total, concurrency, warmup, pid):
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https'):
+        raise BenchError(f"Unsupported URL scheme: {parts.scheme or '(none)'}")
+    use_ssl = parts.scheme == 'https'
+    port = parts.port or (443 if use_ssl else 80)
+    path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+    paths = {'on': path, 'off': with_ignore(path)}
+
+    results = {'on': {'latencies': [], 'bytes': [], 'errors': 0},
+               'off': {'latencies': [], 'bytes': [], 'errors': 0}}
+    counter = iter(range(total))
+    rss = {'before': read_rss(pid) if pid else None, 'peak': None}
+
+    async def sample_rss():
+        while True:
+            value = read_rss(pid)
+            if value is not None and (rss['peak'] is None or value > rss['peak']):
+                rss['peak'] = value
+            await asyncio.sleep(0.1)
+
+    async def worker():
+        conn = Connection(parts.hostname, port, use_ssl)
+        try:
+            for _ in range(warmup):
+                try:
+                    await conn.get(paths['on'])
+                    await conn.get(paths['off'])
+                except BenchError:
+                    raise
+                except REQUEST_ERRORS as e:
+                    # IncompleteReadError is an EOFError, which click would
+                    # turn into a bare "Aborted!"; report it properly instead.
+                    raise BenchError(f"Warm-up request failed: {e!r}")
+            for i in counter:
+                mode = 'on' if i % 2 == 0 else 'off'
+                start = time.perf_counter()
+                try:
+                    status, length = await conn.get(paths[mode])
+                except REQUEST_ERRORS:
+                    conn.close()
+                    results[mode]['errors'] += 1
+                    continue
+                elapsed = time.perf_counter() - start
+                if status >= 400:
+                    results[mode]['errors'] += 1
+                    continue
+                results[mode]['latencies'].append(elapsed)
+                results[mode]['bytes'].append(length)
+        finally:
+            conn.close()
+
+    sampler = asyncio.ensure_future(sample_rss()) if pid else None
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        if sampler:
+            sampler.cancel()
+    elapsed = time.perf_counter() - started
+    rss['after'] = read_rss(pid) if pid else None
+
+    return _summarize(results, elapsed, concurrency, rss)
+
+
+def _summarize(results, elapsed, concurrency, rss):
+    report = {'elapsed': elapsed, 'concurrency': concurrency, 'rss': rss}
+    for mode, data in results.items():
+        latencies = sorted(data['latencies'])
+        count = len(latencies)
+        mean = sum(latencies) / count if count else 0.0
+        report[mode] = {
+            'requests': count,
+            'errors': data['errors'],
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'mean': mean,
+            # Both modes share the connections, so per-mode throughput is
+            # estimated from latency (Little's law) rather than wall time.
+            'rps': concurrency / mean if mean else 0.0,
+            'bytes': sum(data['bytes']) / count if count else 0.0,
+        }
+    report['bytes_added'] = report['on']['bytes'] - report['off']['bytes']
+    return report
+
+
+def run_bench(url, total=1000, concurrency=10, warmup=5, pid=None):
+    """Benchmark `url` with injection on and off and return a report dict."""
+    return asyncio.run(_run(url, total, concurrency, warmup, pid))
+
+
+def format_bytes(value):
+    sign = '-' if value < 0 else ''
+    value = abs(value)
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if value < 1024 or unit == 'GB':
+            return f"{sign}{value:.1f} {unit}" if unit != 'B' else f"{sign}{value:.0f} B"
+        value /= 1024
@@ -51,17 +51,127 @@ def clean():
     else:
         click.echo("No logs found.")
 
+@main.group()
+def logs():
+    """Inspect saved debugger logs."""
+    pass
+
+@logs.command()
+@click.option('--limit', default=10, type=int, help='Rows to show per table')
+@click.option('--json', 'as_json', is_flag=True, help='Print the raw summary as JSON')
+@click.option('--path', 'paths', multiple=True, help='Estimate the event count for a path (repeatable)')
+@click.option('--tag', 'tags', multiple=True, help='Estimate the event count for a tag (repeatable)')
+@click.option('--event-type', 'event_types', multiple=True, help='Estimate the event count for an event type (repeatable)')
+def stats(limit, as_json, paths, tags, event_types):
+    """Show running aggregates across all saved logs."""
+    from .log_store import get_store
+    store = get_store(get_log_dir())
+    summary = store.summary(limit)
+
+    queries = [('path', v) for v in paths] + [('tag', v) for v in tags] + [('eventType', v) for v in event_types]
+    if queries:
+        estimates = {}
+        for field, value in queries:
+            estimates.setdefault(field, {})[value] = store.estimate(field, value)
+        if as_json:
+            click.echo(__import__('json').dumps(estimates, indent=2))
+            return
+        for field, values in estimates.items():
+            for value, count in values.items():
+                click.echo(f"  ~{count:>6}  {field}={value}")
+        return
+
+    if as_json:
+        click.echo(__import__('json').dumps(summary, indent=2))
+        return
+
+    if not summary['total_events']:
+        click.echo("No logs found.")
+        return
+
+    click.echo(f"📊 {summary['total_events']} events recorded")
+    for title, key in [('Paths', 'paths'), ('Tags', 'tags'), ('Event types', 'event_types')]:
+        click.echo(f"\n{title}:")
+        for value, count in summary[key]:
+            click.echo(f"  {count:>7}  {value}")
+
+    for prop, values in sorted(summary['computed'].items()):
+        click.echo(f"\ncomputed.{prop}:")
+        for value, count in values:
+            click.echo(f"  {count:>7}  {value}")
+
+    rates = summary['events_per_minute']
+    if rates:
+        peak = max(count for _, count in rates)
+        click.echo(f"\n⏱️ {len(rates)} active minutes, peak {peak} events/min")
+
+@main.command()
+@click.argument('url')
+@click.option('-n', '--requests', 'total', default=1000, type=click.IntRange(min=1), help='Total requests (split evenly between on and off)')
+@click.option('-c', '--concurrency', default=10, type=click.IntRange(min=1), help='Concurrent keep-alive connections')
+@click.option('--warmup', default=5, type=click.IntRange(min=0), help='Warm-up request pairs per connection (not measured)')
+@click.option('--pid', default=None, type=int, help='Server process id, to report RSS changes')
+def bench(url, total, concurrency, warmup, pid):
+    """Measure the debugger's overhead on a running app.
+    
+    Alternates requests with injection on and off (via ?ui_debugger_ignore=true)
+    and compares latency, throughput and response size.
+    
+    Usage:
+        ui-debugger bench http://localhost:8000/ -n 2000 -c 20 --pid 12345
+    """
+    from .bench import run_bench, format_bytes, BenchError
+    
+    click.echo(f"⏱️  Benchmarking {url} ({total} requests, {concurrency} connections)...")
+    try:
+        report = run_bench(url, total, concurrency, warmup, pid)
+    except (BenchError, OSError) as e:
+        click.echo(f"❌ Benchmark failed: {e}")
+        return
+    
+    if not report['on']['requests'] and not report['off']['requests']:
+        click.echo(f"❌ All {report['on']['errors'] + report['off']['errors']} requests failed")
+        return
+    
+    click.echo(f"\n{'':<16}{'injected':>12}{'ignored':>12}{'delta':>12}")
+    rows = [('p50 (ms)', 'p50', 1000), ('p95 (ms)', 'p95', 1000), ('p99 (ms)', 'p99', 1000),
+            ('req/s (est.)', 'rps', 1), ('body (bytes)', 'bytes', 1)]
+    for label, key, scale in rows:
+        on, off = report['on'][key] * scale, report['off'][key] * scale
+        click.echo(f"{label:<16}{on:>12.1f}{off:>12.1f}{on - off:>+12.1f}")
+    click.echo(f"{'errors':<16}{report['on']['errors']:>12}{report['off']['errors']:>12}")
+    
+    click.echo(f"\n📦 Bytes added per page: {format_bytes(report['bytes_added'])}")
+    click.echo(f"🚀 Overall throughput: {(report['on']['requests'] + report['off']['requests']) / report['elapsed']:.1f} req/s")
+    
+    rss = report['rss']
+    if pid and rss['before'] is not None and rss['after'] is not None:
+        click.echo(f"🧠 Server RSS: {format_bytes(rss['before'])} -> {format_bytes(rss['after'])} "
+                   f"({format_bytes(rss['after'] - rss['before'])}, peak {format_bytes(rss['peak'] or rss['after'])})")
+    elif pid:
+        click.echo(f"⚠️  Could not read RSS for pid {pid}")
+
 @main.command(context_settings=dict(
     ignore_unknown_options=True,
+    # Options after the command belong to it (e.g. `uvicorn main:app --workers 4`)
+    allow_interspersed_args=False,
 ))
+@click.option('--cache-size', default=0, type=int, help='Proxy asset cache size in MB (PHP/HTML projects, 0 = off)')
+@click.option('--workers', default=1, type=int, help='Number of proxy processes sharing the port (PHP/HTML projects)')
 @click.argument('args', nargs=-1, type=click.UNPROCESSED)
-def start(args):
+def start(cache_size, workers, args):
     """Start your app with UI Debugger injected (Universal Zero Config).
     
     Run from ANYWHERE - automatically finds your project!
     
     Usage: 
         ui-debugger start    # Run from any directory near your project
+        ui-debugger start --cache-size 64    # Cache proxied assets in memory
+        ui-debugger start --workers 4        # Run the proxy on 4 processes
+        ui-debugger start --workers 4 -- php -S localhost:8000
+    
+    Our options must come before the command; everything after it (or
+    after `--`) is passed to the command unchanged.
     
     Supports: Django, Flask, FastAPI, Next.js, React, Vue, PHP, Ruby, HTML, and more!
     """
@@ -300,7 +410,7 @@ def start(args):
             click.echo("🌐 Starting proxy server with UI Debugger injection...")
             
             import threading
-            from .proxy_server import start_proxy_server
+            from .proxy_server import start_proxy_server, supports_workers, ProxySupervisor
             
             # Determine backend command
             if not args:
@@ -310,26 +420,69 @@ def start(args):
                     import sys
                     args = (sys.executable, '-m', 'http.server', '8000')
             
+            proxy_supervisor = None
+            if workers > 1 and not supports_workers():
+                click.echo("⚠️  --workers is only supported on Linux; using a single proxy process")
+                workers = 1
+            
             click.echo(f"🚀 Starting backend: {' '.join(args)}")
-            server_process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            # With workers, keep the backend out of our process group so Ctrl+C
+            # doesn't kill it while the proxy is still draining requests to it.
+            server_process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                              start_new_session=workers > 1)
             
             import time
             time.sleep(2)
             
-            proxy_thread = threading.Thread(target=start_proxy_server, args=(8000, 8001), daemon=True)
-            proxy_thread.start()
+            if workers > 1:
+                # The backend is in its own session, so a closed terminal or a
+                # kill wouldn't reach it; route both through the cleanup below.
+                import signal
+                def stop_on_signal(signum, frame):
+                    raise KeyboardInterrupt
+                signal.signal(signal.SIGHUP, stop_on_signal)
+                signal.signal(signal.SIGTERM, stop_on_signal)
+                
+                proxy_supervisor = ProxySupervisor(workers, 8000, 8001, cache_size * 1024 * 1024, os.getcwd())
+                try:
+                    proxy_supervisor.start()
+                except RuntimeError as e:
+                    click.echo(f"❌ {e}")
+                    server_process.terminate()
+                    server_process.wait()
+                    return
+            else:
+                proxy_thread = threading.Thread(
+                    target=start_proxy_server,
+                    args=(8000, 8001, cache_size * 1024 * 1024, os.getcwd()),
+                    daemon=True,
+                )
+                proxy_thread.start()
             
             click.echo("✅ Proxy server running on http://localhost:8001")
+            if cache_size:
+                click.echo(f"🗃️  Asset cache enabled ({cache_size} MB, cleared on file changes)")
             click.echo("⚠️  Press Ctrl+C to stop")
             
             try:
-                server_process.wait()
+                while server_process.poll() is None:
+                    if proxy_supervisor and proxy_supervisor.failed.is_set():
+                        click.echo("❌ Proxy workers keep crashing, stopping")
+                        break
+                    time.sleep(0.5)
             except KeyboardInterrupt:
                 pass
             finally:
-                if server_process:
-                    server_process.terminate()
-                    server_process.wait()
+                try:
+                    if proxy_supervisor:
+                        click.echo("⏳ Draining proxy workers...")
+                        proxy_supervisor.stop()
+                finally:
+                    # Stopped after the workers so drained requests can still
+                    # reach it, even if a second Ctrl+C cuts the drain short
+                    if server_process:
+                        server_process.terminate()
+                        server_process.wait()
                 click.echo("🧹 Cleaned up successfully")
             return
     
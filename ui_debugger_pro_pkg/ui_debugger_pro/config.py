@@ -10,7 +10,8 @@ DEFAULT_CONFIG = {
     "max_logs": 50,
     "auto_delete_days": 7,
     "theme": "dark",
-    "terminal_mode": False
+    "terminal_mode": False,
+    "profile_hz": 100
 }
 
 def load_config():
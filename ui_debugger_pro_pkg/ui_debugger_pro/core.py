@@ -1,8 +1,11 @@
 import os
 import json
+import math
 import time
 from werkzeug.wrappers import Request, Response
 from .config import is_enabled, get_log_dir, load_config
+from .log_store import get_store, DEFAULT_SESSION
+from .profiler import get_profiler, wants_profile, PROFILE_PARAM, PROFILE_HEADER
 
 class UIDebuggerMiddleware:
     def __init__(self, app):
@@ -21,6 +24,12 @@ class UIDebuggerMiddleware:
         if request.path == '/ui-debugger-pro/logs' and request.method == 'POST':
             return self.handle_logs(request, start_response)
 
+        if request.path == '/ui-debugger-pro/summary':
+            return self.handle_summary(request, start_response)
+
+        if request.path == '/ui-debugger-pro/profile':
+            return self.handle_profile(request, start_response)
+
         if not is_enabled() or request.args.get('ui_debugger_ignore') == 'true':
             return self.app(environ, start_response)
 
@@ -33,15 +42,20 @@ class UIDebuggerMiddleware:
             response_info['exc_info'] = exc_info
             # Don't call start_response yet
 
-        app_iter = self.app(environ, save_response_info)
-        
-        content = b''
-        # Iterate to get content (this triggers the app to run and call save_response_info)
-        try:
-            content = b''.join(app_iter)
-        except Exception:
-            # If app fails, we might need to handle it, but usually we just let it bubble
-            pass
+        def run_app():
+            app_iter = self.app(environ, save_response_info)
+            # Iterate to get content (this triggers the app to run and call save_response_info)
+            try:
+                return b''.join(app_iter)
+            except Exception:
+                # If app fails, we might need to handle it, but usually we just let it bubble
+                return b''
+
+        if wants_profile(request.args.get(PROFILE_PARAM), request.headers.get(PROFILE_HEADER)):
+            with get_profiler().track(f"{request.method} {request.path}"):
+                content = run_app()
+        else:
+            content = run_app()
 
         # Now we have headers and content
         if response_info['status'] is None:
@@ -85,29 +99,96 @@ class UIDebuggerMiddleware:
     def handle_logs(self, request, start_response):
         try:
             data = json.loads(request.data)
+            since = request.args.get('since')
+            if since is not None:
+                try:
+                    # Cursors are echoed back from `timestamp`, which may be fractional
+                    since = float(since)
+                    if not math.isfinite(since):
+                        raise ValueError(since)
+                except ValueError:
+                    start_response('400 Bad Request', [('Content-Type', 'application/json')])
+                    return [json.dumps({'error': f"invalid since: {since!r}"}).encode('utf-8')]
             log_dir = get_log_dir()
             if not os.path.exists(log_dir):
                 os.makedirs(log_dir)
-            
-            filename = f"ui-debug-log-{int(time.time())}.json"
-            filepath = os.path.join(log_dir, filename)
-            
-            with open(filepath, 'w') as f:
-                json.dump(data, f, indent=2)
+
+            def write_log(entries):
+                # Millisecond names so two saves in the same second don't overwrite each other
+                stamp = int(time.time() * 1000)
+                while os.path.exists(os.path.join(log_dir, f"ui-debug-log-{stamp}.json")):
+                    stamp += 1
+                filepath = os.path.join(log_dir, f"ui-debug-log-{stamp}.json")
+
+                try:
+                    with open(filepath, 'w') as f:
+                        json.dump(entries, f, indent=2)
+                except BaseException:
+                    # Don't leave a truncated file for `logs` commands to trip over
+                    if os.path.exists(filepath):
+                        os.remove(filepath)
+                    raise
+
+            # The front end re-sends its whole history on every save; only
+            # keep the entries this session hasn't uploaded before. They are
+            # marked as seen only once the log file has been written.
+            result = {'status': 'saved'}
+            if isinstance(data, list):
+                store = get_store(log_dir)
+                session = request.args.get('session') or request.headers.get('X-UI-Debugger-Session') or DEFAULT_SESSION
+                received = len(data)
+                data = store.add(data, session, since, persist=write_log)
+                result.update(written=len(data), skipped=received - len(data), cursor=store.cursor(session))
+                if not data:
+                    result['status'] = 'unchanged'
+            elif data:
+                write_log(data)
             
             # Cleanup old logs
             config = load_config()
             max_logs = config.get('max_logs', 50)
-            files = sorted([os.path.join(log_dir, f) for f in os.listdir(log_dir) if f.endswith('.json')])
+            files = sorted([os.path.join(log_dir, f) for f in os.listdir(log_dir) if f.startswith('ui-debug-log-') and f.endswith('.json')])
             while len(files) > max_logs:
                 os.remove(files.pop(0))
 
             start_response('200 OK', [('Content-Type', 'application/json')])
-            return [b'{"status": "saved"}']
+            return [json.dumps(result).encode('utf-8')]
         except Exception as e:
             start_response('500 Internal Server Error', [])
             return [str(e).encode()]
 
+    def handle_summary(self, request, start_response):
+        limit = request.args.get('limit', 20, type=int)
+        store = get_store(get_log_dir())
+        summary = store.summary(limit)
+        # ?path=, ?tag= and ?eventType= look up counts for values outside the top lists
+        estimates = {}
+        for field in ('path', 'tag', 'eventType'):
+            for value in request.args.getlist(field):
+                estimates.setdefault(field, {})[value] = store.estimate(field, value)
+        if estimates:
+            summary['estimates'] = estimates
+        data = json.dumps(summary).encode('utf-8')
+        start_response('200 OK', [('Content-Type', 'application/json'), ('Content-Length', str(len(data)))])
+        return [data]
+
+    def handle_profile(self, request, start_response):
+        profiler = get_profiler()
+        if request.method == 'DELETE':
+            profiler.clear()
+            start_response('200 OK', [('Content-Type', 'application/json')])
+            return [b'{"status": "cleared"}']
+
+        route = request.args.get('route')
+        if request.args.get('format') == 'folded':
+            data = profiler.folded(route).encode('utf-8')
+            content_type = 'text/plain'
+        else:
+            data = json.dumps(profiler.speedscope(route)).encode('utf-8')
+            content_type = 'application/json'
+        start_response('200 OK', [('Content-Type', content_type), ('Content-Length', str(len(data)))])
+        return [data]
+
 def inject_debugger(html_content):
     """Helper to inject the script tag into HTML string."""
     script = '<script src="/ui-debugger-pro/loader.js"></script>'
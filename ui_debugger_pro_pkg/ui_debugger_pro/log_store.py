@@ -0,0 +1,450 @@
+"""
+Running aggregates over saved debugger history.
+
+Every batch posted to /ui-debugger-pro/logs is folded into a small summary
+at ingest time, so questions like "which selectors get hovered most" can be
+answered without re-reading every saved log file.
+
+The front end re-sends its whole history on every save, so batches are first
+checked against a per-session index of event fingerprints and only events
+the server hasn't seen are written and aggregated. The index is an
+append-only journal, so a save costs the size of the new events rather than
+of everything seen so far; it is compacted when it grows well past the
+entries still remembered.
+
+Aggregates live in the memory of the process that receives the upload and
+are written out whole. Under a multi-process server (e.g. gunicorn with
+several workers) each worker keeps its own store and the last one to save
+wins, so run the dev server with a single process if the counts matter.
+"""
+import hashlib
+import json
+import math
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+SUMMARY_FILE = "summary.json"
+INDEX_FILE = "seen-index.jsonl"
+
+# Sizes are fixed so the summary stays bounded however long a session runs.
+SKETCH_WIDTH = 1024
+SKETCH_DEPTH = 4
+TOP_K = 50
+RATE_MINUTES = 120
+
+# The front end keeps at most 5000 history entries, so remembering several
+# times that per session is enough to recognise anything it can re-send.
+SEEN_PER_SESSION = 50000
+MAX_SESSIONS = 20
+DEFAULT_SESSION = 'default'
+
+# Rewrite the journal once it holds this many more lines than the index
+# remembers (evicted and superseded fingerprints still sit in the file).
+COMPACT_SLACK = 20000
+
+
+def _hash_key(key, depth):
+    # Python's hash() is salted per process; the sketch is persisted, so use
+    # a stable digest and slice one 32-bit index per row out of it.
+    digest = hashlib.blake2b(str(key).encode('utf-8'), digest_size=4 * depth).digest()
+    return [int.from_bytes(digest[i * 4:(i + 1) * 4], 'little') for i in range(depth)]
+
+
+class CountMinSketch:
+    """Approximate frequency counter using fixed memory."""
+
+    def __init__(self, width=SKETCH_WIDTH, depth=SKETCH_DEPTH, rows=None):
+        self.width = width
+        self.depth = depth
+        self.rows = rows or [[0] * width for _ in range(depth)]
+
+    def add(self, key, count=1):
+        for row, h in zip(self.rows, _hash_key(key, self.depth)):
+            row[h % self.width] += count
+
+    def estimate(self, key):
+        return min(row[h % self.width] for row, h in zip(self.rows, _hash_key(key, self.depth)))
+
+    def to_dict(self):
+        return {'width': self.width, 'depth': self.depth, 'rows': self.rows}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['width'], data['depth'], data['rows'])
+
+
+class TopK:
+    """Space-Saving heavy hitters: tracks at most `capacity` keys."""
+
+    def __init__(self, capacity=TOP_K, counts=None):
+        self.capacity = capacity
+        self.counts = dict(counts or {})
+
+    def add(self, key, count=1):
+        if key in self.counts:
+            self.counts[key] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = count
+        else:
+            # Replace the smallest entry; its count becomes the new key's
+            # error bound, which keeps real heavy hitters from being evicted.
+            victim = min(self.counts, key=self.counts.get)
+            self.counts[key] = self.counts.pop(victim) + count
+
+    def items(self, limit=None):
+        ranked = sorted(self.counts.items(), key=lambda kv: kv[1], reverse=True)
+        return ranked[:limit] if limit else ranked
+
+    def to_dict(self):
+        return {'capacity': self.capacity, 'counts': self.counts}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['capacity'], data['counts'])
+
+
+def fingerprint(entry):
+    """Stable identity of a history entry: timestamp, path, eventType and computed styles."""
+    key = json.dumps(
+        [entry.get('timestamp'), entry.get('path'), entry.get('eventType'), entry.get('computed')],
+        sort_keys=True, default=str,
+    )
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def _timestamp(entry):
+    """The entry's timestamp if it is a finite number, else None."""
+    timestamp = entry.get('timestamp')
+    if isinstance(timestamp, (int, float)) and not isinstance(timestamp, bool) and math.isfinite(timestamp):
+        return timestamp
+    return None
+
+
+def _label(value):
+    """A scalar field as a string key, or None for empty and non-scalar values."""
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)) or value == '':
+        return None
+    return str(value)
+
+
+def _event_fields(entry):
+    """The parts of an entry the aggregates count, validated up front."""
+    computed = entry.get('computed')
+    timestamp = _timestamp(entry)
+    return (
+        _label(entry.get('path')),
+        _label(entry.get('tag')),
+        _label(entry.get('eventType')),
+        [(str(prop), str(value)) for prop, value in computed.items()] if isinstance(computed, dict) else [],
+        None if timestamp is None else int(timestamp // 60000),
+    )
+
+
+class SeenIndex:
+    """Bounded per-session set of entry fingerprints, oldest evicted first."""
+
+    def __init__(self, per_session=SEEN_PER_SESSION, max_sessions=MAX_SESSIONS):
+        self.per_session = per_session
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()
+
+    def cursor(self, session):
+        state = self.sessions.get(session)
+        return state['cursor'] if state else None
+
+    def filter_new(self, session, entries, since=None):
+        """Return `(fingerprint, entry)` pairs not seen before for `session`.
+
+        Nothing is remembered until `record` is called, so a batch that fails
+        to be stored is accepted again on the next upload. Entries older than
+        `since` (ms timestamp) are skipped without hashing.
+        """
+        state = self.sessions.get(session)
+        seen = state['seen'] if state else {}
+        batch = set()
+        fresh = []
+        for entry in entries:
+            if not isinstance(entry, dict):
+                continue
+            timestamp = _timestamp(entry)
+            if since is not None and timestamp is not None and timestamp < since:
+                continue
+            key = fingerprint(entry)
+            if key in seen or key in batch:
+                continue
+            batch.add(key)
+            fresh.append((key, entry))
+        return fresh
+
+    def record(self, session, fresh):
+        """Remember the `(fingerprint, entry)` pairs returned by `filter_new`.
+
+        Returns the journal lines (`[session, fingerprint, timestamp]`) that
+        replay the change.
+        """
+        lines = []
+        for key, entry in fresh:
+            lines.append([session, key, _timestamp(entry)])
+        self.replay(lines)
+        return lines
+
+    def replay(self, lines):
+        """Apply journal lines; `fingerprint` may be None for a cursor-only line."""
+        for session, key, timestamp in lines:
+            state = self._session(session)
+            if key is not None:
+                state['seen'][key] = None
+                if len(state['seen']) > self.per_session:
+                    state['seen'].popitem(last=False)
+            if timestamp is not None and (state['cursor'] is None or timestamp > state['cursor']):
+                state['cursor'] = timestamp
+
+    def _session(self, session):
+        state = self.sessions.get(session)
+        if state is None:
+            state = self.sessions[session] = {'seen': OrderedDict(), 'cursor': None}
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+        self.sessions.move_to_end(session)
+        return state
+
+    def __len__(self):
+        return sum(len(state['seen']) for state in self.sessions.values())
+
+    def journal(self):
+        """Journal lines that rebuild the current index, for compaction."""
+        for session, state in self.sessions.items():
+            for key in state['seen']:
+                yield [session, key, None]
+            yield [session, None, state['cursor']]
+
+
+class LogStore:
+    """Aggregates for one log directory, persisted next to the log files."""
+
+    def __init__(self, log_dir):
+        self.log_dir = log_dir
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        # Held for a whole upload so two copies of the same batch can't both be written.
+        self.add_lock = threading.Lock()
+        self.journal_lines = 0
+        # The index is only needed to accept uploads, so it is read on the
+        # first add() rather than by every `logs stats` or /summary request.
+        self.index_loaded = False
+        self.total = 0
+        self.sketch = CountMinSketch()
+        self.paths = TopK()
+        self.tags = TopK()
+        self.event_types = TopK()
+        self.computed = {}
+        self.rates = OrderedDict()
+        self.seen = SeenIndex()
+
+    @property
+    def summary_path(self):
+        return os.path.join(self.log_dir, SUMMARY_FILE)
+
+    @property
+    def index_path(self):
+        return os.path.join(self.log_dir, INDEX_FILE)
+
+    def add(self, entries, session=DEFAULT_SESSION, since=None, persist=None):
+        """Drop entries already received for `session`, store and aggregate the rest.
+
+        `persist(entries)` is called with the new entries before they are
+        marked as seen; if it raises, nothing is recorded and the same
+        entries are accepted again next time. Returns the new entries.
+        """
+        with self.add_lock:
+            self._load_index()
+            with self.lock:
+                fresh = self.seen.filter_new(session, entries, since)
+            entries = [entry for _, entry in fresh]
+            # Validate before anything is written, so a bad entry can't leave
+            # the batch stored and marked as seen but only partly counted.
+            fields = [_event_fields(entry) for entry in entries]
+            if entries and persist:
+                persist(entries)
+            with self.lock:
+                lines = self.seen.record(session, fresh)
+            self._append_index(lines)
+            self._count(fields)
+            self.save()
+        return entries
+
+    def _append_index(self, lines):
+        if not lines:
+            return
+        if not os.path.exists(self.log_dir):
+            os.makedirs(self.log_dir)
+        with self.save_lock:
+            with open(self.index_path, 'a') as f:
+                for line in lines:
+                    f.write(json.dumps(line) + '\n')
+            self.journal_lines += len(lines)
+            if self.journal_lines > 2 * len(self.seen) + COMPACT_SLACK:
+                self._compact_index()
+
+    def _compact_index(self):
+        with self.lock:
+            lines = list(self.seen.journal())
+        _write_lines(self.index_path, lines)
+        self.journal_lines = len(lines)
+
+    def cursor(self, session=DEFAULT_SESSION):
+        """Newest entry timestamp received for `session`, usable as the next `since`."""
+        with self.add_lock:
+            self._load_index()
+        with self.lock:
+            return self.seen.cursor(session)
+
+    def ingest(self, entries):
+        """Fold a batch of history entries into the aggregates."""
+        self._count([_event_fields(entry) for entry in entries if isinstance(entry, dict)])
+
+    def _count(self, fields):
+        with self.lock:
+            for path, tag, event_type, computed, minute in fields:
+                self.total += 1
+                if path:
+                    self.sketch.add(f"path:{path}")
+                    self.paths.add(path)
+                if tag:
+                    self.sketch.add(f"tag:{tag}")
+                    self.tags.add(tag)
+                if event_type:
+                    self.sketch.add(f"eventType:{event_type}")
+                    self.event_types.add(event_type)
+                for prop, value in computed:
+                    if prop not in self.computed:
+                        self.computed[prop] = TopK()
+                    self.computed[prop].add(value)
+                if minute is not None:
+                    self._count_minute(minute)
+
+    def _count_minute(self, minute):
+        key = str(minute)
+        self.rates[key] = self.rates.get(key, 0) + 1
+        if len(self.rates) > RATE_MINUTES:
+            # History arrives roughly in order, so dropping the oldest
+            # bucket keeps the window on the most recent minutes.
+            oldest = min(self.rates, key=int)
+            del self.rates[oldest]
+
+    def estimate(self, field, value):
+        """Approximate event count for any path/tag/eventType, including ones outside the top-k."""
+        with self.lock:
+            return self.sketch.estimate(f"{field}:{value}")
+
+    def summary(self, limit=20):
+        with self.lock:
+            return {
+                'total_events': self.total,
+                'paths': self.paths.items(limit),
+                'tags': self.tags.items(limit),
+                'event_types': self.event_types.items(limit),
+                'computed': {prop: top.items(limit) for prop, top in self.computed.items()},
+                'events_per_minute': [[int(m) * 60000, c] for m, c in sorted(self.rates.items(), key=lambda kv: int(kv[0]))],
+            }
+
+    def to_dict(self):
+        return {
+            'total': self.total,
+            'sketch': self.sketch.to_dict(),
+            'paths': self.paths.to_dict(),
+            'tags': self.tags.to_dict(),
+            'event_types': self.event_types.to_dict(),
+            'computed': {prop: top.to_dict() for prop, top in self.computed.items()},
+            'rates': self.rates,
+        }
+
+    def save(self):
+        if not os.path.exists(self.log_dir):
+            os.makedirs(self.log_dir)
+        with self.lock:
+            data = self.to_dict()
+        # The index is journalled separately in add(), so reading the summary never touches it.
+        with self.save_lock:
+            _write_json(self.summary_path, data)
+
+    @classmethod
+    def load(cls, log_dir):
+        store = cls(log_dir)
+        try:
+            with open(store.summary_path, 'r') as f:
+                data = json.load(f)
+            store.total = data['total']
+            store.sketch = CountMinSketch.from_dict(data['sketch'])
+            store.paths = TopK.from_dict(data['paths'])
+            store.tags = TopK.from_dict(data['tags'])
+            store.event_types = TopK.from_dict(data['event_types'])
+            store.computed = {prop: TopK.from_dict(top) for prop, top in data['computed'].items()}
+            store.rates = OrderedDict(data['rates'])
+        except OSError:
+            pass  # No summary yet
+        except (ValueError, KeyError, TypeError):
+            # A corrupt summary just restarts aggregation from scratch.
+            store = cls(log_dir)
+        return store
+
+    def _load_index(self):
+        """Replay the seen-index journal once. Callers hold `add_lock`, so nothing else uses `seen` yet."""
+        if self.index_loaded:
+            return
+        self.index_loaded = True
+        damaged = False
+        try:
+            with open(self.index_path, 'r') as f:
+                for raw in f:
+                    self.journal_lines += 1
+                    try:
+                        self.seen.replay([json.loads(raw)])
+                    except (ValueError, TypeError):
+                        # A line cut short by a crash; worst case its entry is stored once more
+                        damaged = True
+        except OSError:
+            pass  # No index yet
+        if damaged:
+            # Rewrite so new lines aren't appended onto the broken one
+            with self.save_lock:
+                self._compact_index()
+
+
+def _write_json(path, payload):
+    """Atomically replace `path`; the temp file is unique so concurrent writers can't collide."""
+    _replace(path, lambda f: json.dump(payload, f))
+
+
+def _write_lines(path, lines):
+    """Atomically replace `path` with one JSON value per line."""
+    _replace(path, lambda f: f.writelines(json.dumps(line) + '\n' for line in lines))
+
+
+def _replace(path, write):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(log_dir):
+    """Return the shared LogStore for `log_dir`, loading it on first use."""
+    with _stores_lock:
+        store = _stores.get(log_dir)
+        if store is None or not os.path.exists(store.summary_path):
+            # Reload if the summary was removed (e.g. `ui-debugger clean`).
+            store = LogStore.load(log_dir)
+            _stores[log_dir] = store
+        return store
@@ -0,0 +1,190 @@
+"""
+On-demand sampling profiler for requests made during a debugger session.
+
+A request opts in with `?ui_debugger_profile=true` or an
+`X-UI-Debugger-Profile: 1` header. While at least one such request is in
+flight, a background thread reads `sys._current_frames()` at a fixed rate
+and counts the stacks of the profiled threads per route. When nothing is
+being profiled the thread exits, so there is no cost at all when off.
+
+Only the WSGI middleware uses this. Samples are attributed by thread, and
+ASGI apps interleave many requests on the event loop (and run sync
+endpoints on pool threads), so per-route stacks would be wrong there.
+"""
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from .config import load_config
+
+PROFILE_PARAM = 'ui_debugger_profile'
+PROFILE_HEADER = 'X-UI-Debugger-Profile'
+
+# Distinct stacks kept per route; further new stacks are counted as truncated.
+MAX_STACKS = 10000
+TRUNCATED = ('[truncated]',)
+
+# Routes are raw paths (/users/1, /users/2, ...), so cap how many get their
+# own profile; samples for any further routes are pooled under OTHER_ROUTES.
+MAX_ROUTES = 200
+OTHER_ROUTES = '[other routes]'
+
+DEFAULT_HZ = 100
+MAX_HZ = 1000
+
+
+def wants_profile(query_value, header_value):
+    """True if a request's query flag or header asks to be profiled."""
+    for value in (query_value, header_value):
+        if value and value.lower() in ('1', 'true', 'yes', 'on'):
+            return True
+    return False
+
+
+def _frame_name(code):
+    if isinstance(code, str):
+        return code
+    return f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Counts folded stacks of registered threads, keyed by route."""
+
+    def __init__(self, hz=DEFAULT_HZ, max_stacks=MAX_STACKS, max_routes=MAX_ROUTES):
+        if not 0 < hz <= MAX_HZ:
+            raise ValueError(f"hz must be between 0 and {MAX_HZ}, got {hz}")
+        self.interval = 1.0 / hz
+        self.max_stacks = max_stacks
+        self.max_routes = max_routes
+        self.lock = threading.Lock()
+        self.active = {}
+        self.stacks = {}
+        self.thread = None
+
+    @contextmanager
+    def track(self, route):
+        """Sample the current thread, attributing its stacks to `route`."""
+        ident = threading.get_ident()
+        with self.lock:
+            self.active.setdefault(ident, []).append(route)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='ui-debugger-profiler', daemon=True)
+                self.thread.start()
+        try:
+            yield
+        finally:
+            with self.lock:
+                routes = self.active[ident]
+                routes.remove(route)
+                if not routes:
+                    del self.active[ident]
+
+    def _run(self):
+        while True:
+            with self.lock:
+                if not self.active:
+                    self.thread = None
+                    return
+                targets = {ident: routes[-1] for ident, routes in self.active.items()}
+                frames = sys._current_frames()
+                for ident, route in targets.items():
+                    frame = frames.get(ident)
+                    if frame is None:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(frame.f_code)
+                        frame = frame.f_back
+                    stack.reverse()
+                    self._count(route, tuple(stack))
+            del frames
+            time.sleep(self.interval)
+
+    def _count(self, route, stack):
+        if route not in self.stacks and len(self.stacks) >= self.max_routes:
+            route = OTHER_ROUTES
+        counter = self.stacks.setdefault(route, Counter())
+        if stack in counter or len(counter) < self.max_stacks:
+            counter[stack] += 1
+        else:
+            counter[TRUNCATED] += 1
+
+    def clear(self):
+        with self.lock:
+            self.stacks.clear()
+
+    def _snapshot(self, route=None):
+        with self.lock:
+            return {r: Counter(c) for r, c in self.stacks.items() if route is None or r == route}
+
+    def folded(self, route=None):
+        """Brendan Gregg's folded format (one `route;frame;frame count` per line)."""
+        lines = []
+        for name, counter in sorted(self._snapshot(route).items()):
+            for stack, count in counter.most_common():
+                frames = ';'.join(_frame_name(code).replace(';', ':') for code in stack)
+                lines.append(f"{name};{frames} {count}")
+        return '\n'.join(lines) + ('\n' if lines else '')
+
+    def speedscope(self, route=None):
+        """Speedscope file format with one sampled profile per route."""
+        frames = []
+        frame_index = {}
+        profiles = []
+        for name, counter in sorted(self._snapshot(route).items()):
+            samples = []
+            weights = []
+            for stack, count in counter.most_common():
+                sample = []
+                for code in stack:
+                    if code not in frame_index:
+                        frame_index[code] = len(frames)
+                        if isinstance(code, str):
+                            frames.append({'name': code})
+                        else:
+                            frames.append({'name': code.co_name, 'file': code.co_filename, 'line': code.co_firstlineno})
+                    sample.append(frame_index[code])
+                samples.append(sample)
+                # Weights are in milliseconds so speedscope shows time, not counts.
+                weights.append(count * self.interval * 1000)
+            profiles.append({
+                'type': 'sampled',
+                'name': name,
+                'unit': 'milliseconds',
+                'startValue': 0,
+                'endValue': sum(weights),
+                'samples': samples,
+                'weights': weights,
+            })
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'shared': {'frames': frames},
+            'profiles': profiles,
+            'name': 'UI Debugger Pro backend profile',
+            'exporter': 'ui-debugger-pro',
+        }
+
+
+_profiler = None
+_profiler_lock = threading.Lock()
+
+
+def _configured_hz():
+    hz = load_config().get('profile_hz', DEFAULT_HZ)
+    try:
+        hz = float(hz)
+    except (TypeError, ValueError):
+        return DEFAULT_HZ
+    # Out-of-range values (0, negative) fall back instead of failing every request
+    return hz if 0 < hz <= MAX_HZ else DEFAULT_HZ
+
+
+def get_profiler():
+    """Return the process-wide profiler, created with the configured `profile_hz`."""
+    global _profiler
+    with _profiler_lock:
+        if _profiler is None:
+            _profiler = SamplingProfiler(hz=_configured_hz())
+        return _profiler
@@ -0,0 +1,262 @@
+"""
+In-memory response cache for the proxy server.
+
+Dev backends like `php -S` and `python -m http.server` serve one request at
+a time, so every image, font and script on a page queues behind the slowest
+request. The cache keeps static assets and other cacheable responses in
+memory, bounded by total bytes, and is flushed whenever files under the
+project root change.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+
+# Headers that describe the connection rather than the response body.
+HOP_BY_HOP = {'connection', 'keep-alive', 'transfer-encoding', 'content-length',
+              'proxy-connection', 'te', 'trailer', 'upgrade'}
+
+# How many URLs to remember as not cacheable (e.g. dynamic PHP pages).
+MAX_UNCACHEABLE = 1024
+
+# Directories the file watcher never descends into.
+SKIP_DIRS = {'node_modules', 'vendor', '.git', 'venv', '.venv', '__pycache__', 'ui_debug_logs'}
+
+# Content types cached without explicit freshness headers: files served
+# straight from the project, which only change when the watcher sees it.
+STATIC_TYPES = ('image/', 'font/', 'text/css', 'javascript', 'application/wasm',
+                'application/font-', 'application/vnd.ms-fontobject')
+
+
+class CachedResponse:
+    def __init__(self, status, headers, body, expires):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.expires = expires
+
+
+def _header(headers, name):
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def freshness(status, headers, now):
+    """Return the time a response stops being fresh, or None if it must not be cached.
+
+    Static assets (and responses with a validator such as ETag or
+    Last-Modified) without explicit freshness information are kept until the
+    project watcher sees a file change, since that is when dev assets change.
+    Anything else, e.g. a JSON endpoint, is dynamic and not cached.
+    """
+    if status != 200:
+        return None
+    content_type = (_header(headers, 'content-type') or '').lower()
+    if 'text/html' in content_type:
+        return None
+    if _header(headers, 'set-cookie') is not None:
+        return None
+    if (_header(headers, 'vary') or '').strip() == '*':
+        return None
+
+    directives = {}
+    for part in (_header(headers, 'cache-control') or '').split(','):
+        name, _, value = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = value.strip('"')
+
+    if {'no-store', 'no-cache', 'private'} & directives.keys():
+        return None
+    for name in ('s-maxage', 'max-age'):
+        if name in directives:
+            try:
+                max_age = int(directives[name])
+            except ValueError:
+                return None
+            return now + max_age if max_age > 0 else None
+
+    expires = _header(headers, 'expires')
+    if expires is not None:
+        try:
+            expires_at = parsedate_to_datetime(expires).timestamp()
+        except (TypeError, ValueError):
+            return None  # Invalid Expires means "already expired"
+        return expires_at if expires_at > now else None
+
+    if any(t in content_type for t in STATIC_TYPES):
+        return float('inf')
+    if _header(headers, 'etag') is not None or _header(headers, 'last-modified') is not None:
+        return float('inf')
+    return None
+
+
+class ResponseCache:
+    """Byte-bounded LRU cache keyed by URL plus the request headers named in Vary."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.vary = {}
+        self.inflight = {}
+        self.uncacheable = OrderedDict()
+        # Bumped by clear(); a fetch that spans a clear may hold a stale body.
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def _key(self, url, request_headers):
+        names = self.vary.get(url, ())
+        return (url,) + tuple(request_headers.get(name, '') for name in names)
+
+    def _lookup(self, url, request_headers):
+        key = self._key(url, request_headers)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= time.time():
+            self._evict(key)
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def _evict(self, key):
+        entry = self.entries.pop(key)
+        self.size -= len(entry.body)
+
+    def get(self, url, request_headers):
+        with self.lock:
+            return self._lookup(url, request_headers)
+
+    def put(self, url, request_headers, status, headers, body, generation=None):
+        """Store a backend response if it is cacheable. Returns True if stored.
+
+        Pass the `generation` read before fetching to drop the response if the
+        cache was cleared while it was in flight.
+        """
+        expires = freshness(status, headers, time.time())
+        if expires is None or len(body) > self.max_bytes:
+            return False
+
+        vary = tuple(sorted(
+            name.strip().lower()
+            for name in (_header(headers, 'vary') or '').split(',') if name.strip()
+        ))
+        headers = [(k, v) for k, v in headers if k.lower() not in HOP_BY_HOP]
+
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return False
+            if self.vary.get(url, ()) != vary:
+                # Variant set changed: drop entries stored under the old keys.
+                for key in [k for k in self.entries if k[0] == url]:
+                    self._evict(key)
+                if vary:
+                    self.vary[url] = vary
+                else:
+                    del self.vary[url]
+            key = self._key(url, request_headers)
+            if key in self.entries:
+                self._evict(key)
+            self.entries[key] = CachedResponse(status, headers, body, expires)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                self._evict(next(iter(self.entries)))
+        return True
+
+    def get_or_fetch(self, url, request_headers, fetch):
+        """Return (status, headers, body), calling `fetch` at most once per URL at a time.
+
+        Concurrent misses for the same URL wait for the first fetch to finish
+        and are then served from the cache. URLs whose last response could not
+        be stored skip the wait, since followers would only fetch again anyway.
+        """
+        with self.lock:
+            entry = self._lookup(url, request_headers)
+            if entry is not None:
+                return entry.status, entry.headers, entry.body
+            generation = self.generation
+            if url in self.uncacheable:
+                self.uncacheable.move_to_end(url)
+                event, leader = None, False
+            else:
+                event = self.inflight.get(url)
+                leader = event is None
+                if leader:
+                    event = self.inflight[url] = threading.Event()
+
+        if event is None:
+            return self._fetch_and_store(url, request_headers, fetch, generation)
+
+        if not leader:
+            event.wait()
+            entry = self.get(url, request_headers)
+            if entry is not None:
+                return entry.status, entry.headers, entry.body
+            # The leader's response was not cacheable (or failed); go ourselves.
+            return fetch()
+
+        try:
+            return self._fetch_and_store(url, request_headers, fetch, generation)
+        finally:
+            with self.lock:
+                del self.inflight[url]
+            event.set()
+
+    def _fetch_and_store(self, url, request_headers, fetch, generation):
+        status, headers, body = fetch()
+        stored = self.put(url, request_headers, status, headers, body, generation)
+        with self.lock:
+            if generation != self.generation:
+                pass  # Cleared mid-fetch; the next request decides afresh
+            elif stored:
+                self.uncacheable.pop(url, None)
+            else:
+                self.uncacheable[url] = None
+                while len(self.uncacheable) > MAX_UNCACHEABLE:
+                    self.uncacheable.popitem(last=False)
+        return status, headers, body
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.vary.clear()
+            self.uncacheable.clear()
+            self.size = 0
+            self.generation += 1
+
+
+class MtimeWatcher(threading.Thread):
+    """Polls file mtimes under `root` and calls `on_change` when anything differs."""
+
+    def __init__(self, root, on_change, interval=1.0):
+        super().__init__(daemon=True)
+        self.root = root
+        self.on_change = on_change
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def snapshot(self):
+        mtimes = {}
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    mtimes[path] = os.stat(path).st_mtime_ns
+                except OSError:
+                    pass
+        return mtimes
+
+    def run(self):
+        previous = self.snapshot()
+        while not self.stopped.wait(self.interval):
+            current = self.snapshot()
+            if current != previous:
+                self.on_change()
+                previous = current
+
+    def stop(self):
+        self.stopped.set()
@@ -3,16 +3,32 @@ Proxy server that injects UI Debugger into HTML responses.
 Used for PHP, Ruby, and static HTML sites.
 """
 import http.server
-import socketserver
+import multiprocessing
+import signal
+import socket
+import sys
+import threading
+import time
 import urllib.request
 import urllib.error
 import re
+from urllib.parse import urlsplit, parse_qs
+from .proxy_cache import ResponseCache, MtimeWatcher
+
+# Conditional headers are dropped when filling the cache so the backend
+# always answers with a full body we can store.
+CONDITIONAL_HEADERS = {'if-none-match', 'if-modified-since', 'if-match', 'if-unmodified-since', 'if-range'}
 
 
 class ProxyHandler(http.server.SimpleHTTPRequestHandler):
     """HTTP proxy that injects the debugger script."""
     
     backend_port = 8000
+    cache = None  # Optional ResponseCache for static assets
+    # With --workers, the supervisor's file watcher bumps this shared counter
+    # and each worker clears its cache when it sees a new value.
+    cache_epoch = None
+    seen_epoch = 0
     
     def do_GET(self):
         self._proxy_request('GET')
@@ -20,35 +36,68 @@ class ProxyHandler(http.server.SimpleHTTPRequestHandler):
     def do_POST(self):
         self._proxy_request('POST')
     
-    def _proxy_request(self, method):
-        # Build the backend URL
+    def _fetch_backend(self, method, skip_headers=()):
+        """Forward the current request to the backend and return (status, headers, body)."""
         backend_url = f"http://localhost:{self.backend_port}{self.path}"
         
+        if method == 'POST':
+            content_length = int(self.headers.get('Content-Length', 0))
+            post_data = self.rfile.read(content_length) if content_length > 0 else None
+            req = urllib.request.Request(backend_url, data=post_data, method='POST')
+        else:
+            req = urllib.request.Request(backend_url, method='GET')
+        
+        # Copy headers
+        for key, value in self.headers.items():
+            if key.lower() not in ['host', 'connection'] and key.lower() not in skip_headers:
+                req.add_header(key, value)
+        
+        with urllib.request.urlopen(req, timeout=30) as response:
+            return response.status, list(response.headers.items()), response.read()
+    
+    def _sync_cache(self):
+        epoch = self.cache_epoch.value
+        if epoch != ProxyHandler.seen_epoch:
+            ProxyHandler.seen_epoch = epoch
+            self.cache.clear()
+    
+    def _use_cache(self, method):
+        if self.cache is None or method != 'GET':
+            return False
+        if self.cache_epoch is not None:
+            self._sync_cache()
+        # Page navigations get HTML, which is never cached, so don't make
+        # concurrent loads of a slow page wait on each other.
+        if 'text/html' in self.headers.get('Accept', '').lower():
+            return False
+        # A hard reload asks for a fresh copy; the result still refills the cache.
+        request_cache_control = self.headers.get('Cache-Control', '').lower()
+        return 'no-cache' not in request_cache_control and 'no-store' not in request_cache_control
+    
+    def _proxy_request(self, method):
         try:
-            # Forward the request to the backend
-            if method == 'POST':
-                content_length = int(self.headers.get('Content-Length', 0))
-                post_data = self.rfile.read(content_length) if content_length > 0 else None
-                req = urllib.request.Request(backend_url, data=post_data, method='POST')
+            # Get response from backend (or the asset cache)
+            if self._use_cache(method):
+                status, headers, content = self.cache.get_or_fetch(
+                    self.path, self.headers,
+                    lambda: self._fetch_backend(method, CONDITIONAL_HEADERS),
+                )
             else:
-                req = urllib.request.Request(backend_url, method='GET')
+                generation = self.cache.generation if self.cache is not None else None
+                status, headers, content = self._fetch_backend(method)
+                if self.cache is not None and method == 'GET':
+                    self.cache.put(self.path, self.headers, status, headers, content, generation)
             
-            # Copy headers
-            for key, value in self.headers.items():
-                if key.lower() not in ['host', 'connection']:
-                    req.add_header(key, value)
+            content_type = next((v for k, v in headers if k.lower() == 'content-type'), '')
             
-            # Get response from backend
-            with urllib.request.urlopen(req, timeout=30) as response:
-                content = response.read()
-                content_type = response.headers.get('Content-Type', '')
-                
-                # Inject debugger if HTML
-                if 'text/html' in content_type:
-                    try:
-                        html = content.decode('utf-8')
-                        # Inject our script
-                        script_tag = '''
+            ignored = parse_qs(urlsplit(self.path).query).get('ui_debugger_ignore') == ['true']
+            
+            # Inject debugger if HTML
+            if 'text/html' in content_type and not ignored:
+                try:
+                    html = content.decode('utf-8')
+                    # Inject our script
+                    script_tag = '''
 <script>
 (function() {
     // Load UI Debugger from CDN or local
@@ -71,36 +120,224 @@ class ProxyHandler(http.server.SimpleHTTPRequestHandler):
 })();
 </script>
 '''
-                        if '</body>' in html:
-                            html = html.replace('</body>', script_tag + '</body>')
-                        elif '</html>' in html:
-                            html = html.replace('</html>', script_tag + '</html>')
-                        else:
-                            html += script_tag
-                        
-                        content = html.encode('utf-8')
-                    except:
-                        pass  # If decoding fails, send original
-                
-                # Send response
-                self.send_response(response.status)
-                for key, value in response.headers.items():
-                    if key.lower() not in ['content-length', 'transfer-encoding']:
-                        self.send_header(key, value)
-                self.send_header('Content-Length', str(len(content)))
-                self.end_headers()
-                self.wfile.write(content)
-                
+                    if '</body>' in html:
+                        html = html.replace('</body>', script_tag + '</body>')
+                    elif '</html>' in html:
+                        html = html.replace('</html>', script_tag + '</html>')
+                    else:
+                        html += script_tag
+                    
+                    content = html.encode('utf-8')
+                except:
+                    pass  # If decoding fails, send original
+            
+            # Send response
+            self.send_response(status)
+            for key, value in headers:
+                if key.lower() not in ['content-length', 'transfer-encoding']:
+                    self.send_header(key, value)
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+            
         except urllib.error.URLError as e:
             self.send_error(502, f"Bad Gateway: {str(e)}")
         except Exception as e:
             self.send_error(500, f"Internal Server Error: {str(e)}")
 
 
-def start_proxy_server(backend_port=8000, proxy_port=8001):
-    """Start the proxy server."""
+class ReusePortHTTPServer(http.server.ThreadingHTTPServer):
+    """Threaded server that shares its port with sibling worker processes."""
+
+    # Non-daemon request threads let server_close() wait for in-flight
+    # requests, which is what makes a SIGTERM shutdown a graceful drain.
+    daemon_threads = False
+
+    def server_bind(self):
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+
+def supports_workers():
+    """Only Linux load-balances connections across SO_REUSEPORT sockets.
+
+    macOS and the BSDs accept the option but hand every connection to one
+    socket, so extra workers there would just sit idle.
+    """
+    return sys.platform.startswith('linux') and hasattr(socket, 'SO_REUSEPORT')
+
+
+def _configure_handler(backend_port, cache_bytes, watch_root):
     ProxyHandler.backend_port = backend_port
     
-    with socketserver.TCPServer(("", proxy_port), ProxyHandler) as httpd:
+    watcher = None
+    if cache_bytes > 0:
+        ProxyHandler.cache = ResponseCache(cache_bytes)
+        if watch_root:
+            watcher = MtimeWatcher(watch_root, ProxyHandler.cache.clear)
+            watcher.start()
+    return watcher
+
+
+def start_proxy_server(backend_port=8000, proxy_port=8001, cache_bytes=0, watch_root=None):
+    """Start the proxy server.
+
+    With `cache_bytes` > 0, cacheable non-HTML responses are kept in memory
+    and flushed whenever a file under `watch_root` changes.
+    """
+    watcher = _configure_handler(backend_port, cache_bytes, watch_root)
+    
+    # Threaded so cached assets are not queued behind a slow backend page.
+    with http.server.ThreadingHTTPServer(("", proxy_port), ProxyHandler) as httpd:
         print(f"Proxy server running on port {proxy_port}, forwarding to {backend_port}")
+        try:
+            httpd.serve_forever()
+        finally:
+            if watcher:
+                watcher.stop()
+
+
+def _run_worker(backend_port, proxy_port, cache_bytes, cache_epoch, ready):
+    """Entry point of a single pre-forked proxy process."""
+    # Ctrl+C (and a closed terminal's SIGHUP) reaches the whole process group;
+    # the supervisor decides when workers stop and tells them with SIGTERM.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    
+    # The supervisor runs the only file watcher, so workers don't each walk the tree.
+    _configure_handler(backend_port, cache_bytes, None)
+    ProxyHandler.cache_epoch = cache_epoch
+    ProxyHandler.seen_epoch = cache_epoch.value
+    try:
+        httpd = ReusePortHTTPServer(("", proxy_port), ProxyHandler)
+    except OSError as e:
+        print(f"Proxy worker could not listen on port {proxy_port}: {e}")
+        sys.exit(1)
+    ready.set()
+    
+    def drain(signum, frame):
+        # shutdown() blocks until serve_forever() returns, so it can't run
+        # on the thread that is inside serve_forever().
+        threading.Thread(target=httpd.shutdown, daemon=True).start()
+    
+    signal.signal(signal.SIGTERM, drain)
+    try:
         httpd.serve_forever()
+    finally:
+        httpd.server_close()  # Waits for in-flight requests
+
+
+class ProxySupervisor:
+    """Runs N proxy processes on one port and restarts any that crash.
+
+    A worker that dies within `QUICK_EXIT` seconds of starting is restarted
+    with exponential backoff, and after `MAX_QUICK_EXITS` such deaths in a
+    row its slot is given up; once every slot is given up, `failed` is set.
+    """
+    
+    QUICK_EXIT = 5.0
+    MAX_QUICK_EXITS = 5
+    MAX_BACKOFF = 30.0
+    
+    def __init__(self, workers, backend_port=8000, proxy_port=8001, cache_bytes=0,
+                 watch_root=None, drain_timeout=10, startup_timeout=5):
+        self.workers = workers
+        self.backend_port = backend_port
+        self.proxy_port = proxy_port
+        self.cache_bytes = cache_bytes
+        self.watch_root = watch_root
+        self.drain_timeout = drain_timeout
+        self.startup_timeout = startup_timeout
+        self.cache_epoch = multiprocessing.Value('L', 0)
+        self.processes = []
+        self.started = []
+        self.quick_exits = []
+        self.retry_at = []
+        self.stopping = threading.Event()
+        self.failed = threading.Event()
+        self.monitor = None
+        self.watcher = None
+    
+    def _spawn(self):
+        ready = multiprocessing.Event()
+        process = multiprocessing.Process(
+            target=_run_worker,
+            args=(self.backend_port, self.proxy_port, self.cache_bytes, self.cache_epoch, ready),
+        )
+        process.start()
+        return process, ready
+    
+    def _clear_caches(self):
+        with self.cache_epoch.get_lock():
+            self.cache_epoch.value += 1
+    
+    def start(self):
+        """Start the workers; raises RuntimeError if any of them can't start serving."""
+        spawned = [self._spawn() for _ in range(self.workers)]
+        self.processes = [process for process, _ in spawned]
+        deadline = time.monotonic() + self.startup_timeout
+        for process, ready in spawned:
+            while not ready.wait(0.1):
+                if not process.is_alive() or time.monotonic() > deadline:
+                    self.stop()
+                    raise RuntimeError(f"Proxy workers could not start on port {self.proxy_port} "
+                                       f"(is it already in use?)")
+        
+        now = time.monotonic()
+        self.started = [now] * self.workers
+        self.quick_exits = [0] * self.workers
+        self.retry_at = [None] * self.workers
+        if self.cache_bytes > 0 and self.watch_root:
+            self.watcher = MtimeWatcher(self.watch_root, self._clear_caches)
+            self.watcher.start()
+        self.monitor = threading.Thread(target=self._watch, daemon=True)
+        self.monitor.start()
+        print(f"Proxy server running on port {self.proxy_port} with {self.workers} workers, "
+              f"forwarding to {self.backend_port}")
+    
+    def _watch(self):
+        while not self.stopping.wait(1.0):
+            now = time.monotonic()
+            for i, process in enumerate(self.processes):
+                if process is None or process.is_alive() or self.stopping.is_set():
+                    continue
+                if self.retry_at[i] is None:
+                    process.join()
+                    if now - self.started[i] < self.QUICK_EXIT:
+                        self.quick_exits[i] += 1
+                    else:
+                        self.quick_exits[i] = 0
+                    if self.quick_exits[i] >= self.MAX_QUICK_EXITS:
+                        print(f"Proxy worker {process.pid} keeps exiting on startup, giving up on it")
+                        self.processes[i] = None
+                        continue
+                    delay = min(self.MAX_BACKOFF, 2 ** self.quick_exits[i] - 1)
+                    print(f"Proxy worker {process.pid} exited with code {process.exitcode}, "
+                          f"restarting in {delay:.0f}s")
+                    self.retry_at[i] = now + delay
+                if now >= self.retry_at[i]:
+                    self.retry_at[i] = None
+                    self.processes[i], _ = self._spawn()
+                    self.started[i] = now
+            if all(process is None for process in self.processes):
+                print("All proxy workers failed")
+                self.failed.set()
+                return
+    
+    def stop(self):
+        """Ask every worker to drain, then kill any that outlive `drain_timeout`."""
+        self.stopping.set()
+        if self.watcher:
+            self.watcher.stop()
+        if self.monitor:
+            self.monitor.join()
+        processes = [process for process in self.processes if process is not None]
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + self.drain_timeout
+        for process in processes:
+            process.join(max(0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.kill()
+                process.join()